@@ -0,0 +1,62 @@
+"""Shared setup for the Playwright tests.
+
+Every launch gets the same low-latency flag set, so a copy-pasted test
+can't silently miss one.
+"""
+import asyncio, signal
+
+# Drop saved room state from a reused profile once per tab (manual reloads
+# keep their session); HTTP and DNS caches are left alone
+RESET_ROOM_STATE_JS = """if (!sessionStorage.getItem('ghost-test-reset')) {
+    sessionStorage.setItem('ghost-test-reset', '1');
+    for (const k of Object.keys(localStorage))
+        if (k === 'g:session' || k.startsWith('g:msg_')) localStorage.removeItem(k);
+}"""
+
+PERF_ARGS = ('--no-sandbox', '--disable-gpu', '--disable-dev-shm-usage')
+
+async def make_chromium(pw, headless=True, viewport=None, persistent_dir=None,
+                        extra_args=(), **context_options):
+    """Launch Chromium with PERF_ARGS (+ --headless=new when headless).
+
+    With persistent_dir, returns a persistent BrowserContext on that profile.
+    Otherwise returns a Browser; viewport and context_options are
+    persistent-only (pass them to browser.new_context instead) and raise
+    TypeError here.
+    """
+    args = [*PERF_ARGS, *(['--headless=new'] if headless else []), *extra_args]
+    if persistent_dir:
+        if viewport:
+            context_options['viewport'] = viewport
+        return await pw.chromium.launch_persistent_context(
+            persistent_dir, headless=headless, args=args, **context_options)
+    if viewport or context_options:
+        raise TypeError('viewport/context options need persistent_dir; '
+                        'pass them to browser.new_context() instead')
+    return await pw.chromium.launch(headless=headless, args=args)
+
+# Resource types the checks don't need; aborting them speeds up page loads.
+# Fonts stay: the app's Inter web font drives layout, touch-target sizes and screenshots.
+BLOCKED_RESOURCES = ('image', 'media')
+
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def wait_for_ctrl_c():
+    """Block until Ctrl+C without waking the event loop."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+    except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        pass
+    try:
+        await stop.wait()
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except NotImplementedError:
+            pass
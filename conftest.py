@@ -0,0 +1,21 @@
+"""pytest fixtures for the Playwright tests: one driver and one Chromium per session.
+
+    pytest test_interop.py test_mobile.py test_pwa_linux.py
+
+Requires pytest-asyncio; pytest.ini runs every async test on the session
+loop. Each test opens its own context on the shared browser.
+"""
+import pytest_asyncio
+from playwright.async_api import async_playwright
+from bench_setup import make_chromium
+
+@pytest_asyncio.fixture(scope='session', loop_scope='session')
+async def pw():
+    async with async_playwright() as p:
+        yield p
+
+@pytest_asyncio.fixture(scope='session', loop_scope='session')
+async def browser(pw):
+    b = await make_chromium(pw)
+    yield b
+    await b.close()
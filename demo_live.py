@@ -3,19 +3,51 @@
 Creates room, shows QR code, connects bot, exchanges messages.
 Browser stays open for user to join from phone.
 """
-import time, requests, sys
-from playwright.sync_api import sync_playwright
+import queue, requests, sys
+from playwright.sync_api import sync_playwright, Error
 
 URL = 'http://localhost:8091/ghost.html'
 
+# Keep-alive connection to Ollama across demo turns
+ollama_session = requests.Session()
+SYSTEM_PROMPT = 'You are a friendly AI in an encrypted P2P chat room called Ghost Chat. Keep responses to 1-2 short sentences. Be casual and fun.'
+
+# Set an input's value and click a button in one CDP round-trip instead of fill + click
+FILL_CLICK_JS = """([sel, txt, btn]) => {
+    const i = document.querySelector(sel);
+    i.value = txt;
+    i.dispatchEvent(new Event('input', {bubbles: true}));
+    document.querySelector(btn).click();
+}"""
+
+def fill_click(page, sel, text, btn):
+    page.evaluate(FILL_CLICK_JS, [sel, text, btn])
+
+# Prefix of the console lines the page logs for each new chat message
+MSG_TAG = 'ghost-msg:'
+
+MSG_COUNT_JS = "() => document.querySelectorAll('#messages .msg').length"
+
+def send(page, text, peer=None):
+    """Send a chat message; with peer, wait until it shows up on peer's page."""
+    prev = peer.evaluate(MSG_COUNT_JS) if peer else 0
+    fill_click(page, '#msg-in', text, '#btn-send')
+    if peer:
+        peer.wait_for_function(
+            "n => document.querySelectorAll('#messages .msg').length > n",
+            arg=prev, timeout=15000
+        )
+
 def ollama(text):
-    r = requests.post('http://localhost:11434/api/chat', json={
+    r = ollama_session.post('http://localhost:11434/api/chat', json={
         'model': 'qwen2.5:3b',
         'messages': [
-            {'role': 'system', 'content': 'You are a friendly AI in an encrypted P2P chat room called Ghost Chat. Keep responses to 1-2 short sentences. Be casual and fun.'},
+            {'role': 'system', 'content': SYSTEM_PROMPT},
             {'role': 'user', 'content': text}
         ],
-        'stream': False
+        'stream': False,
+        'keep_alive': '30m',
+        'options': {'num_ctx': 2048}
     }, timeout=120)
     return r.json()['message']['content'].strip().split('\n')[0]
 
@@ -30,8 +62,7 @@ def main():
         claude = ctx.new_page()
         claude.goto(URL)
         claude.wait_for_selector('#nick-in')
-        claude.fill('#nick-in', 'claude')
-        claude.click('#btn-create')
+        fill_click(claude, '#nick-in', 'claude', '#btn-create')
         print('[*] Room created as "claude"')
 
         # Wait for offer code
@@ -44,7 +75,7 @@ def main():
         print(f'[*] Room URL: {room_url}')
 
         # Screenshot the QR code
-        time.sleep(1)
+        claude.wait_for_selector('#offer-qr svg, #offer-qr img', state='visible')
         claude.screenshot(path='/mnt/shared/ghost_qr.png', full_page=False)
         print('[*] QR screenshot saved to /mnt/shared/ghost_qr.png')
 
@@ -52,16 +83,13 @@ def main():
         bot = ctx.new_page()
         bot.goto(URL)
         bot.wait_for_selector('#nick-in')
-        bot.fill('#nick-in', 'qwen')
-        bot.click('#btn-join')
+        fill_click(bot, '#nick-in', 'qwen', '#btn-join')
         bot.wait_for_selector('#room-url')
-        bot.fill('#room-url', room_url)
-        bot.click('#btn-go')
+        fill_click(bot, '#room-url', room_url, '#btn-go')
         print('[*] qwen joining...')
 
         bot.wait_for_selector('#host-code', timeout=15000)
-        bot.fill('#host-code', offer)
-        bot.click('#btn-process')
+        fill_click(bot, '#host-code', offer, '#btn-process')
 
         bot.wait_for_function(
             "document.querySelector('#my-answer')?.value?.startsWith('A:')",
@@ -71,8 +99,7 @@ def main():
         print('[*] Got answer code')
 
         # Claude accepts answer
-        claude.fill('#peer-code', answer)
-        claude.click('#btn-connect')
+        fill_click(claude, '#peer-code', answer, '#btn-connect')
 
         # Wait for chat
         claude.wait_for_selector('#chat-view', timeout=15000)
@@ -80,69 +107,80 @@ def main():
         print('[+] Connected! Both in chat.\n')
 
         # === CLAUDE SAYS SOMETHING ===
-        claude.fill('#msg-in', "hey qwen, what do you think about peer-to-peer encrypted chat?")
-        claude.click('#btn-send')
+        send(claude, "hey qwen, what do you think about peer-to-peer encrypted chat?", peer=bot)
         print('[claude] hey qwen, what do you think about peer-to-peer encrypted chat?')
-        time.sleep(2)
 
         # === OLLAMA RESPONDS ===
         reply = ollama("hey qwen, what do you think about peer-to-peer encrypted chat?")
-        bot.fill('#msg-in', reply)
-        bot.click('#btn-send')
+        send(bot, reply, peer=claude)
         print(f'[qwen] {reply}')
-        time.sleep(1)
 
         # Another exchange
-        claude.fill('#msg-in', "waiting for karan to join from his phone. he's going to scan the QR code.")
-        claude.click('#btn-send')
+        send(claude, "waiting for karan to join from his phone. he's going to scan the QR code.", peer=bot)
         print('[claude] waiting for karan to join from his phone...')
-        time.sleep(2)
 
         reply2 = ollama("The creator said they're waiting for a human named Karan to join from his phone by scanning a QR code. Say something welcoming.")
-        bot.fill('#msg-in', reply2)
-        bot.click('#btn-send')
+        send(bot, reply2, peer=claude)
         print(f'[qwen] {reply2}')
-        time.sleep(1)
 
         # Switch to claude's tab and screenshot the chat
         claude.bring_to_front()
-        time.sleep(0.5)
+        claude.wait_for_function('!document.hidden')
         claude.screenshot(path='/mnt/shared/ghost_chat.png', full_page=False)
         print('\n[*] Chat screenshot saved to /mnt/shared/ghost_chat.png')
         print(f'[*] Room link: {room_url}')
         print('[*] Browser is open. Scan QR from /mnt/shared/ghost_qr.png to join.')
         print('[*] Press Ctrl+C to close.\n')
 
-        # Keep browser open for user to join
+        # Keep browser open for user to join. The page logs each new message
+        # with MSG_TAG; the listener only queues it, and the main loop blocks on
+        # the next tagged console event, so nothing runs while the room is idle.
+        new_msgs = queue.Queue()
+        seen = set()
+
+        def handle_new(m):
+            # If there's a new message not from claude or qwen, have qwen respond
+            if not ('] karan:' in m.lower() or ('] ' in m and 'claude:' not in m and 'qwen:' not in m)):
+                return
+            # Extract message text
+            parts = m.split('] ', 1)
+            if len(parts) < 2 or ':' not in parts[1]:
+                return
+            text = parts[1].split(':', 1)[1].strip()
+            if text and text not in seen:
+                seen.add(text)
+                print(f'[user] {text}')
+                r = ollama(text)
+                send(bot, r)
+                print(f'[qwen] {r}')
+
+        def is_new_msg(c):
+            return c.text.startswith(MSG_TAG)
+
+        def on_console(c):
+            # Runs in Playwright's dispatcher: only queue, never block here
+            if is_new_msg(c):
+                new_msgs.put(c.text[len(MSG_TAG):])
+
+        claude.on('console', on_console)
+        claude.evaluate("""tag => {
+            const box = document.querySelector('#messages');
+            for (const el of box.querySelectorAll('.msg:not(.sys)')) console.log(tag + el.textContent);
+            new MutationObserver(muts => {
+                for (const mut of muts)
+                    for (const n of mut.addedNodes)
+                        if (n.classList?.contains('msg') && !n.classList.contains('sys'))
+                            console.log(tag + n.textContent);
+            }).observe(box, {childList: true});
+        }""", MSG_TAG)
         try:
             while True:
-                time.sleep(5)
-                # Check for new messages from user on claude's side
-                msgs = claude.evaluate("""() => {
-                    const els = document.querySelectorAll('#messages .msg:not(.sys)');
-                    return Array.from(els).map(el => el.textContent);
-                }""")
-                # If there's a new message not from claude or qwen, have qwen respond
-                for m in msgs:
-                    if '] karan:' in m.lower() or ('] ' in m and 'claude:' not in m and 'qwen:' not in m):
-                        # Extract message text
-                        parts = m.split('] ', 1)
-                        if len(parts) > 1:
-                            content = parts[1]
-                            if ':' in content:
-                                text = content.split(':', 1)[1].strip()
-                                if text and not hasattr(main, '_seen'):
-                                    main._seen = set()
-                                if text and text not in getattr(main, '_seen', set()):
-                                    main._seen = getattr(main, '_seen', set()) | {text}
-                                    print(f'[user] {text}')
-                                    r = ollama(text)
-                                    bot.fill('#msg-in', r)
-                                    bot.click('#btn-send')
-                                    print(f'[qwen] {r}')
-
-        except KeyboardInterrupt:
-            pass
+                # Messages queued while replying (send() pumps events) go first
+                while not new_msgs.empty():
+                    handle_new(new_msgs.get_nowait())
+                claude.wait_for_event('console', predicate=is_new_msg, timeout=0)
+        except (KeyboardInterrupt, Error):
+            pass  # Ctrl+C, or the page was closed
         finally:
             browser.close()
 
@@ -6,24 +6,167 @@ Usage:
     python3 ghost_bot.py --join     # Join existing room
     python3 ghost_bot.py --demo     # Two bots chat (test)
 """
-import asyncio, argparse, requests, json, sys
+import asyncio, argparse, aiohttp, json, os, re, sys
 from ghost_client import GhostClient
 
 OLLAMA_URL = "http://localhost:11434/api/chat"
 MODEL = "qwen2.5:3b"
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+BATCH_WINDOW = 0.05  # seconds to collect prompts before dispatch
+BATCH_SIZE = 8
+KEEP_ALIVE = "30m"  # keep the model (and its cached prompt prefix) loaded between turns
+NUM_CTX = 2048
+SYSTEM_PROMPT = "You are a helpful AI assistant. Keep responses brief (1-2 sentences)."
+DEMO_SYSTEM_PROMPT = "You are a helpful assistant. Be brief."
+# Sentence break: .?! plus whitespace, or a newline. Not after a dotted
+# abbreviation like "e.g." or "U.S.", which would split mid-sentence.
+SENTENCE_END = re.compile(r'(?<!\.\w)[.?!]\s|\n')
 
-def ollama_chat(messages):
-    """Get response from local Ollama."""
+_session: aiohttp.ClientSession = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Shared keep-alive session for Ollama, created on first use."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=300))
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def ollama_payload(messages, stream):
+    """Request body for /api/chat. Fixed fields keep the prompt prefix reusable across turns."""
+    return {
+        "model": MODEL,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"num_ctx": NUM_CTX},
+    }
+
+async def ollama_check(r):
+    """Raise with Ollama's own error text (e.g. model not pulled) on a failed request."""
+    if r.status >= 400:
+        body = (await r.text()).strip()
+        try:
+            body = json.loads(body)["error"]
+        except (ValueError, KeyError, TypeError):
+            pass
+        raise RuntimeError(f"Ollama HTTP {r.status}: {body}")
+
+async def ollama_chat(messages, send=None):
+    """Get response from local Ollama.
+
+    With send, the reply is streamed and each finished sentence is passed to
+    send as soon as it is generated. The full reply is returned either way.
+    """
+    if send is not None:
+        return await ollama_stream(messages, send)
     try:
-        r = requests.post(OLLAMA_URL, json={
-            "model": MODEL,
-            "messages": messages,
-            "stream": False
-        }, timeout=60)
-        return r.json()["message"]["content"].strip()
+        async with get_session().post(OLLAMA_URL, json=ollama_payload(messages, False), timeout=aiohttp.ClientTimeout(total=60)) as r:
+            await ollama_check(r)
+            return (await r.json())["message"]["content"].strip()
     except Exception as e:
         return f"[Error: {e}]"
 
+async def ollama_stream(messages, send):
+    """Stream a reply from Ollama, sending it sentence by sentence.
+
+    Each sentence goes out as its own chat message, so text is only cut at
+    sentence breaks; an unpunctuated tail is sent once the stream ends.
+    """
+    reply, buf, sent = "", "", False
+    try:
+        async with get_session().post(OLLAMA_URL, json=ollama_payload(messages, True), timeout=aiohttp.ClientTimeout(total=60)) as r:
+            await ollama_check(r)
+            async for line in r.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:  # failed mid-stream
+                    raise RuntimeError(f"Ollama: {chunk['error']}")
+                token = chunk.get("message", {}).get("content", "")
+                reply += token
+                buf += token
+                m = SENTENCE_END.search(buf)
+                while m:
+                    head, buf = buf[:m.end()].strip(), buf[m.end():]
+                    if head:
+                        await send(head)
+                        sent = True
+                    m = SENTENCE_END.search(buf)
+                if chunk.get("done"):
+                    break
+        if buf.strip():
+            await send(buf.strip())
+            sent = True
+        if not sent:
+            # Whitespace-only reply; send what we got rather than regenerate
+            await send(reply.strip() or "[Error: empty reply]")
+        return reply.strip()
+    except Exception as e:
+        # Report the failure even after a partial reply went out
+        await send(f"[Error: {e}]")
+        return reply.strip() if sent else f"[Error: {e}]"
+
+_batch_queue: asyncio.Queue = None
+_batcher_task: asyncio.Task = None
+_dispatched: set = set()  # in-flight batch tasks, kept referenced until done
+
+async def _batcher():
+    """Collect prompts for up to BATCH_WINDOW (or BATCH_SIZE items), then dispatch together.
+
+    Ollama's /api/chat has no batch endpoint, so a batch is dispatched as parallel
+    requests, capped at OLLAMA_NUM_PARALLEL in flight.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+
+    async def run(messages, send, fut):
+        try:
+            async with in_flight:
+                reply = await ollama_chat(messages, send)
+        except BaseException as e:
+            if not fut.done():
+                fut.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            if not fut.done():
+                fut.set_result(reply)
+
+    while True:
+        batch = [await _batch_queue.get()]
+        deadline = loop.time() + BATCH_WINDOW
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_batch_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        task = asyncio.ensure_future(asyncio.gather(*(run(*item) for item in batch)))
+        _dispatched.add(task)
+        task.add_done_callback(_dispatched.discard)
+
+async def batched_ollama_chat(messages, send=None):
+    """Queue a chat request for the batcher and wait for its reply.
+
+    If send is given the reply is streamed through it (see ollama_chat).
+    """
+    global _batch_queue, _batcher_task
+    if _batcher_task is None or _batcher_task.done():
+        _batch_queue = asyncio.Queue()
+        _batcher_task = asyncio.ensure_future(_batcher())
+    fut = asyncio.get_running_loop().create_future()
+    await _batch_queue.put((list(messages), send, fut))
+    return await fut
+
 async def host_mode():
     """Bot creates room, waits for browser to join."""
     client = GhostClient(nick="LLM")
@@ -42,8 +185,7 @@ async def host_mode():
     await client.wait_connected()
     print("[+] Connected! LLM ready.\n")
 
-    conversation = [{"role": "system", "content":
-        "You are a helpful AI assistant. Keep responses brief (1-2 sentences)."}]
+    conversation = [{"role": "system", "content": SYSTEM_PROMPT}]
 
     try:
         while True:
@@ -51,14 +193,14 @@ async def host_mode():
             if msg.type == "chat" and msg.from_id != client.my_id:
                 print(f"[{msg.nick}] {msg.text}")
                 conversation.append({"role": "user", "content": msg.text})
-                reply = ollama_chat(conversation)
+                reply = await batched_ollama_chat(conversation, send=client.send)
                 conversation.append({"role": "assistant", "content": reply})
                 print(f"[LLM] {reply}")
-                await client.send(reply)
     except KeyboardInterrupt:
         pass
     finally:
         await client.close()
+        await close_session()
 
 async def join_mode():
     """Bot joins a room created by browser."""
@@ -90,8 +232,7 @@ async def join_mode():
     await client.wait_connected()
     print("[+] Connected! LLM ready.\n")
 
-    conversation = [{"role": "system", "content":
-        "You are a helpful AI assistant. Keep responses brief (1-2 sentences)."}]
+    conversation = [{"role": "system", "content": SYSTEM_PROMPT}]
 
     try:
         while True:
@@ -99,19 +240,19 @@ async def join_mode():
             if msg.type == "chat" and msg.from_id != client.my_id:
                 print(f"[{msg.nick}] {msg.text}")
                 conversation.append({"role": "user", "content": msg.text})
-                reply = ollama_chat(conversation)
+                reply = await batched_ollama_chat(conversation, send=client.send)
                 conversation.append({"role": "assistant", "content": reply})
                 print(f"[LLM] {reply}")
-                await client.send(reply)
     except KeyboardInterrupt:
         pass
     finally:
         await client.close()
+        await close_session()
 
 async def demo():
     """Two bots chat with each other."""
     print("[demo] Creating room...")
-    alice = GhostClient(nick="Alice")
+    alice = GhostClient(nick="Alice", zstd_codes=True)
     room_id, room_key, offer = await alice.create_room()
 
     bob = GhostClient(nick="LLM")
@@ -125,27 +266,28 @@ async def demo():
 
     await alice.send("Hello! Can you help me with something?")
 
-    conversation = [{"role": "system", "content":
-        "You are a helpful assistant. Be brief."}]
-
-    for _ in range(3):
-        msg = await bob.receive()
-        if msg.type == "chat":
-            print(f"  {msg.nick}: {msg.text}")
-            conversation.append({"role": "user", "content": msg.text})
-            reply = ollama_chat(conversation)
-            conversation.append({"role": "assistant", "content": reply})
-            print(f"  LLM: {reply}")
-            await bob.send(reply)
-
-            # Alice's turn
-            msg2 = await alice.receive()
-            if msg2.type == "chat":
-                print(f"  {msg2.nick}: {msg2.text}")
-                await alice.send("Interesting, tell me more.")
-
-    await alice.close()
-    await bob.close()
+    conversation = [{"role": "system", "content": DEMO_SYSTEM_PROMPT}]
+
+    try:
+        for _ in range(3):
+            msg = await bob.receive()
+            if msg.type == "chat":
+                print(f"  {msg.nick}: {msg.text}")
+                conversation.append({"role": "user", "content": msg.text})
+                reply = await batched_ollama_chat(conversation)
+                conversation.append({"role": "assistant", "content": reply})
+                print(f"  LLM: {reply}")
+                await bob.send(reply)
+
+                # Alice's turn
+                msg2 = await alice.receive()
+                if msg2.type == "chat":
+                    print(f"  {msg2.nick}: {msg2.text}")
+                    await alice.send("Interesting, tell me more.")
+    finally:
+        await alice.close()
+        await bob.close()
+        await close_session()
     print("\n[demo] Done.")
 
 def main():
@@ -20,56 +20,103 @@ Usage:
     await client.send("hello")
     msg = await client.receive()  # blocks until message arrives
 """
-import asyncio, json, os, base64, zlib, uuid, time
+import asyncio, os, base64, zlib, uuid, time
+from collections import OrderedDict
+from functools import lru_cache
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Optional, Union
 from aiortc import RTCPeerConnection, RTCConfiguration, RTCIceServer, RTCSessionDescription
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:  # stdlib json writes the same frames, just slower
+    import json
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+    json_loads = json.loads
+try:
+    import msgpack
+except ImportError:  # binary transport is optional; text frames always work
+    msgpack = None
+try:
+    import zstandard as zstd
+except ImportError:  # zstd share codes are optional; zlib codes always work
+    zstd = None
 
 # ============ CRYPTO ============
 
 def b64url_encode(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
 
 def b64url_decode(s: str) -> bytes:
-    s += '=' * (4 - len(s) % 4)
-    return base64.urlsafe_b64decode(s)
+    return base64.urlsafe_b64decode(s + '=' * (-len(s) & 3))
 
 def generate_room_key() -> bytes:
     """Generate a 256-bit AES key."""
     return AESGCM.generate_key(256)
 
-def encrypt_message(key: bytes, plaintext: str) -> str:
+def encrypt_message(key: bytes, plaintext: Union[bytes, str]) -> str:
     """AES-256-GCM encrypt. Returns base64url(iv + ciphertext)."""
+    if isinstance(plaintext, str):
+        plaintext = plaintext.encode()
     aesgcm = AESGCM(key)
     iv = os.urandom(12)
-    ct = aesgcm.encrypt(iv, plaintext.encode(), None)
-    return b64url_encode(iv + ct)
+    ct = aesgcm.encrypt(iv, plaintext, None)
+    return b64url_encode(b''.join((iv, ct)))
 
 def decrypt_message(key: bytes, data: str) -> str:
     """AES-256-GCM decrypt from base64url(iv + ciphertext)."""
-    raw = b64url_decode(data)
-    iv, ct = raw[:12], raw[12:]
+    raw = memoryview(b64url_decode(data))
     aesgcm = AESGCM(key)
-    return aesgcm.decrypt(iv, ct, None).decode()
+    return aesgcm.decrypt(raw[:12], raw[12:], None).decode()
 
-# ============ SDP COMPRESS ============
-# Compatible with browser's CompressionStream('deflate')
+# ============ WIRE FORMAT ============
+# Text frame (browser-compatible): base64url(iv + AES-GCM(json))
+# Binary frame (Python peers that advertise 'bin' in their join):
+#   WIRE_MAGIC + iv + AES-GCM(type tag + msgpack)
+# The tag is MSG_TYPES[type], with 'type' left out of the msgpack body; tag 0
+# means the body still carries its own 'type' string.
+# Peers without binary support fail to decode the magic-prefixed frame and drop it.
 
-def compress_sdp(sdp: str) -> str:
-    compressed = zlib.compress(sdp.encode())
+WIRE_MAGIC = b'G\x02'
+MSG_TYPES = {'chat': 1, 'join': 2, 'sync': 3, 'destroy': 4}
+
+# ============ SDP COMPRESS ============
+# zlib is compatible with browser's CompressionStream('deflate').
+# zstd gives shorter codes but only Python peers can read it; decompress_sdp
+# tells the two apart by the zstd frame magic, so no extra tag is needed.
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+@lru_cache(maxsize=16)  # retry paths re-encode the same SDP
+def compress_sdp(sdp: str, use_zstd: bool = False) -> str:
+    if use_zstd:
+        return b64url_encode(zstd.ZstdCompressor(level=3).compress(sdp.encode()))
+    # Level 3: nearly level 6's ratio on small SDPs at about twice the speed
+    c = zlib.compressobj(3)
+    compressed = c.compress(sdp.encode()) + c.flush()
     # Browser uses raw deflate, zlib adds header. Strip zlib header (2 bytes) and checksum (4 bytes).
     # Actually, CompressionStream('deflate') uses raw deflate with zlib wrapper.
     # Let's match it exactly: zlib.compress produces zlib format which is what 'deflate' means in web APIs.
     return b64url_encode(compressed)
 
+def is_zstd_sdp(data: str) -> bool:
+    return b64url_decode(data[:8])[:4] == ZSTD_MAGIC
+
 def decompress_sdp(data: str) -> str:
     raw = b64url_decode(data)
+    if raw[:4] == ZSTD_MAGIC:
+        if zstd is None:
+            raise ValueError('zstd share code; install zstandard to read it')
+        return zstd.ZstdDecompressor().decompress(raw).decode()
     return zlib.decompress(raw).decode()
 
 # ============ CLIENT ============
 
-@dataclass
+MSG_QUEUE_MAX = 1024  # pending messages before the oldest non-chat is dropped
+SEEN_IDS_MAX = 4096  # chat ids remembered for de-duplicating sync replays
+
+@dataclass(slots=True)
 class Message:
     id: str
     type: str  # 'chat', 'sys', 'file-offer', etc.
@@ -78,17 +125,70 @@ class Message:
     text: str = ''
     ts: float = 0
 
+class MessageQueue(asyncio.Queue):
+    """asyncio.Queue of Messages that counts its non-chat entries, so
+    evicting for a new message never has to scan an all-chat queue."""
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.n_other = 0
+
+    def _put(self, item):
+        super()._put(item)
+        if item.type != 'chat':
+            self.n_other += 1
+
+    def _get(self):
+        item = super()._get()
+        if item.type != 'chat':
+            self.n_other -= 1
+        return item
+
+    def evict_for(self, msg: Message) -> bool:
+        """Free a slot for msg in a full queue; False if msg should be dropped.
+
+        Removes the oldest non-chat (O(k), k its position) or, for an
+        incoming chat in an all-chat queue, the oldest chat (O(1)).
+        """
+        if self.n_other:
+            i = next(i for i, m in enumerate(self._queue) if m.type != 'chat')
+            del self._queue[i]
+            self.n_other -= 1
+            return True
+        if msg.type == 'chat':
+            self._queue.popleft()
+            return True
+        return False
+
 class GhostClient:
-    def __init__(self, nick: str = 'ghost-agent'):
+    def __init__(self, nick: str = 'ghost-agent', zstd_codes: bool = False):
         self.nick = nick
+        # zstd offer/answer codes are shorter but unreadable by the browser
+        self.zstd_codes = zstd_codes and zstd is not None
         self.my_id = str(uuid.uuid4())
         self.room_id: Optional[str] = None
         self.room_key: Optional[bytes] = None
+        self._aesgcm: Optional[AESGCM] = None  # cached cipher for room_key
+        self._iv_prefix = b''  # random per key; IV = prefix(8) || counter(4)
+        self._iv_ctr = 0
         self.pc: Optional[RTCPeerConnection] = None
         self.dc = None  # data channel
-        self._msg_queue: asyncio.Queue = asyncio.Queue()
+        self._msg_queue = MessageQueue(maxsize=MSG_QUEUE_MAX)
+        self._seen_ids: OrderedDict = OrderedDict()
         self._connected = asyncio.Event()
         self._peers: dict = {}
+        self._binary = False  # peer accepts binary frames
+        self._handlers = {
+            'chat': self._h_chat,
+            'join': self._h_join,
+            'sync': self._h_sync,
+            'destroy': self._h_destroy,
+        }
+        # Indexed by binary type tag; empty slots (incl. 0) fall back to _handlers
+        tag_handlers = [None] * (max(MSG_TYPES.values()) + 1)
+        for name, tag in MSG_TYPES.items():
+            tag_handlers[tag] = self._handlers[name]
+        self._tag_handlers = tuple(tag_handlers)
 
     def _create_pc(self):
         config = RTCConfiguration(iceServers=[
@@ -102,6 +202,8 @@ class GhostClient:
         def do_open():
             self._connected.set()
             msg = {'type': 'join', 'peerId': self.my_id, 'nick': self.nick}
+            if msgpack is not None:
+                msg['bin'] = 1
             asyncio.ensure_future(self._send_raw(msg))
 
         @channel.on('open')
@@ -120,47 +222,100 @@ class GhostClient:
         if hasattr(channel, 'readyState') and channel.readyState == 'open':
             do_open()
 
+    def _reset_iv(self):
+        self._iv_prefix = os.urandom(8)
+        self._iv_ctr = 0
+
+    def _next_iv(self) -> bytes:
+        """Unique GCM nonce without a syscall per message."""
+        if self._iv_ctr >= 0xFFFFFFFF:
+            self._reset_iv()
+        iv = self._iv_prefix + self._iv_ctr.to_bytes(4, 'big')
+        self._iv_ctr += 1
+        return iv
+
     async def _send_raw(self, msg: dict):
         if self.dc and self.dc.readyState == 'open':
-            encrypted = encrypt_message(self.room_key, json.dumps(msg))
-            self.dc.send(encrypted)
+            iv = self._next_iv()
+            if self._binary:
+                tag = MSG_TYPES.get(msg.get('type'), 0)
+                if tag:
+                    msg = {k: v for k, v in msg.items() if k != 'type'}
+                ct = self._aesgcm.encrypt(iv, bytes((tag,)) + msgpack.packb(msg), None)
+                self.dc.send(b''.join((WIRE_MAGIC, iv, ct)))
+                return
+            ct = self._aesgcm.encrypt(iv, json_dumps(msg), None)
+            self.dc.send(b64url_encode(b''.join((iv, ct))))
+
+    def _enqueue(self, msg: Message):
+        """Queue msg without blocking.
+
+        Chats already seen (e.g. replayed by sync on reconnect) are skipped.
+        When the queue is full the oldest non-chat message is dropped; if it
+        holds only chats, an incoming sys message is dropped instead, and an
+        incoming chat displaces the oldest chat.
+        """
+        if msg.type == 'chat' and msg.id:
+            if msg.id in self._seen_ids:
+                return
+            self._seen_ids[msg.id] = None
+            if len(self._seen_ids) > SEEN_IDS_MAX:
+                self._seen_ids.popitem(last=False)
+        if self._msg_queue.full() and not self._msg_queue.evict_for(msg):
+            return
+        self._msg_queue.put_nowait(msg)
+
+    def _h_chat(self, msg: dict):
+        self._enqueue(Message(
+            id=msg.get('id', ''),
+            type='chat',
+            from_id=msg.get('from', ''),
+            nick=msg.get('nick', '?'),
+            text=msg.get('text', ''),
+            ts=msg.get('ts', 0)
+        ))
+
+    def _h_join(self, msg: dict):
+        if msg.get('bin') and msgpack is not None:
+            self._binary = True
+        nick = msg.get('nick', '?')
+        self._enqueue(Message(
+            id=str(uuid.uuid4()),
+            type='sys',
+            nick=nick,
+            text=f"{nick} joined",
+            ts=time.time() * 1000
+        ))
+
+    def _h_sync(self, msg: dict):
+        for m in msg.get('messages', []):
+            if m.get('type') == 'chat':
+                self._h_chat(m)
+
+    def _h_destroy(self, msg: dict):
+        self._enqueue(Message(
+            id=str(uuid.uuid4()), type='sys',
+            text='Room destroyed by admin', ts=time.time() * 1000
+        ))
 
     async def _handle_raw(self, data):
         try:
-            plaintext = decrypt_message(self.room_key, data)
-            msg = json.loads(plaintext)
-            msg_type = msg.get('type', '')
-
-            if msg_type == 'chat':
-                await self._msg_queue.put(Message(
-                    id=msg.get('id', ''),
-                    type='chat',
-                    from_id=msg.get('from', ''),
-                    nick=msg.get('nick', '?'),
-                    text=msg.get('text', ''),
-                    ts=msg.get('ts', 0)
-                ))
-            elif msg_type == 'join':
-                await self._msg_queue.put(Message(
-                    id=str(uuid.uuid4()),
-                    type='sys',
-                    nick=msg.get('nick', '?'),
-                    text=f"{msg.get('nick', '?')} joined",
-                    ts=time.time() * 1000
-                ))
-            elif msg_type == 'sync':
-                for m in msg.get('messages', []):
-                    if m.get('type') == 'chat':
-                        await self._msg_queue.put(Message(
-                            id=m.get('id', ''), type='chat',
-                            from_id=m.get('from', ''), nick=m.get('nick', '?'),
-                            text=m.get('text', ''), ts=m.get('ts', 0)
-                        ))
-            elif msg_type == 'destroy':
-                await self._msg_queue.put(Message(
-                    id=str(uuid.uuid4()), type='sys',
-                    text='Room destroyed by admin', ts=time.time() * 1000
-                ))
+            if isinstance(data, (bytes, bytearray)):
+                raw = memoryview(data)
+                if msgpack is None or raw[:2] != WIRE_MAGIC:
+                    raise ValueError('unsupported binary frame')
+                pt = self._aesgcm.decrypt(raw[2:14], raw[14:], None)
+                msg = msgpack.unpackb(memoryview(pt)[1:])
+                handler = self._tag_handlers[pt[0]] if pt[0] < len(self._tag_handlers) else None
+                if handler:
+                    handler(msg)
+                    return
+            else:
+                raw = memoryview(b64url_decode(data))
+                msg = json_loads(self._aesgcm.decrypt(raw[:12], raw[12:], None))
+            handler = self._handlers.get(msg.get('type', ''))
+            if handler:
+                handler(msg)
         except Exception as e:
             print(f'[ghost_client] decrypt/parse error: {e}')
 
@@ -170,6 +325,8 @@ class GhostClient:
         """Create a room. Returns (room_id, room_key_b64, offer_code)."""
         self.room_id = os.urandom(4).hex()
         self.room_key = generate_room_key()
+        self._aesgcm = AESGCM(self.room_key)
+        self._reset_iv()
         key_b64 = b64url_encode(self.room_key)
 
         self._create_pc()
@@ -182,18 +339,22 @@ class GhostClient:
         # Wait for ICE gathering
         await self._wait_ice()
 
-        code = 'O:' + compress_sdp(self.pc.localDescription.sdp)
+        code = 'O:' + compress_sdp(self.pc.localDescription.sdp, self.zstd_codes)
         return self.room_id, key_b64, code
 
     async def set_room(self, room_id: str, room_key_b64: str):
         """Set room credentials for joining."""
         self.room_id = room_id
         self.room_key = b64url_decode(room_key_b64)
+        self._aesgcm = AESGCM(self.room_key)
+        self._reset_iv()
 
     async def accept_offer(self, offer_code: str) -> str:
         """Accept an offer, return answer code."""
         assert offer_code.startswith('O:'), 'Expected offer code (O:...)'
         sdp = decompress_sdp(offer_code[2:])
+        # Answer in the same codec the offerer used
+        self.zstd_codes = is_zstd_sdp(offer_code[2:])
 
         self._create_pc()
 
@@ -206,7 +367,7 @@ class GhostClient:
         await self.pc.setLocalDescription(answer)
         await self._wait_ice()
 
-        return 'A:' + compress_sdp(self.pc.localDescription.sdp)
+        return 'A:' + compress_sdp(self.pc.localDescription.sdp, self.zstd_codes)
 
     async def accept_answer(self, answer_code: str):
         """Complete connection by accepting an answer."""
@@ -243,19 +404,26 @@ class GhostClient:
         if self.pc:
             await self.pc.close()
 
-    async def _wait_ice(self, timeout=5.0):
-        """Wait for ICE gathering to complete."""
+    async def _wait_ice(self, timeout=1.5):
+        """Wait for ICE gathering to complete.
+
+        aiortc normally finishes gathering inside setLocalDescription, so this
+        returns at once; the short timeout only bounds a slow STUN server.
+        Codes are pasted in one shot, so candidates can't be trickled later.
+        """
         if self.pc.iceGatheringState == 'complete':
             return
         done = asyncio.Event()
-        @self.pc.on('icegatheringstatechange')
         def check():
             if self.pc.iceGatheringState == 'complete':
                 done.set()
+        self.pc.on('icegatheringstatechange', check)
         try:
             await asyncio.wait_for(done.wait(), timeout)
         except asyncio.TimeoutError:
             pass  # use whatever candidates we have
+        finally:
+            self.pc.remove_listener('icegatheringstatechange', check)
 
     @property
     def connected(self) -> bool:
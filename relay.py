@@ -6,6 +6,30 @@ import asyncio, json, sys
 from collections import defaultdict
 
 rooms = defaultdict(set)  # room_id -> set of websockets
+SEND_TIMEOUT = 5.0  # a peer slower than this is dropped from its room
+
+# Notification frames, encoded once. Kept as str so they go out as text frames.
+JOIN_MSG = json.dumps({'type': 'join'})
+LEAVE_MSG = json.dumps({'type': 'leave'})
+PEERS_MSGS = {n: json.dumps({'type': 'peers', 'count': n}) for n in range(1, 9)}
+
+def peers_msg(count):
+    return PEERS_MSGS.get(count) or json.dumps({'type': 'peers', 'count': count})
+
+async def send_or_evict(room, peer, msg):
+    """Send to one peer; evict it if it can't keep up."""
+    try:
+        await asyncio.wait_for(peer.send(msg), SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        rooms.get(room, set()).discard(peer)
+        asyncio.ensure_future(peer.close())
+
+async def broadcast(room, msg, exclude=None):
+    """Send msg to every peer in room except exclude, concurrently."""
+    peers = tuple(p for p in rooms.get(room, ()) if p is not exclude)
+    if peers:
+        await asyncio.gather(*(send_or_evict(room, p, msg) for p in peers),
+                             return_exceptions=True)
 
 async def handle(ws, path):
     """Handle one WebSocket connection."""
@@ -19,27 +43,23 @@ async def handle(ws, path):
     peers = len(rooms[room])
 
     # Notify peer count
-    await ws.send(json.dumps({'type': 'peers', 'count': peers}))
+    await ws.send(peers_msg(peers))
 
     # Notify others of join
-    for peer in rooms[room]:
-        if peer != ws:
-            await peer.send(json.dumps({'type': 'join'}))
+    await broadcast(room, JOIN_MSG, exclude=ws)
 
     try:
         async for msg in ws:
-            # Relay to room
-            for peer in rooms[room]:
-                if peer != ws:
-                    await peer.send(msg)
+            # Relay to room as-is: binary frames stay bytes, text frames are
+            # never re-encoded
+            await broadcast(room, msg, exclude=ws)
     finally:
         # Leave room
         rooms[room].discard(ws)
         if not rooms[room]:
             del rooms[room]
         else:
-            for peer in rooms[room]:
-                await peer.send(json.dumps({'type': 'leave'}))
+            await broadcast(room, LEAVE_MSG)
 
 async def main():
     import websockets
@@ -49,4 +69,9 @@ async def main():
         await asyncio.Future()  # run forever
 
 if __name__ == '__main__':
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # stock asyncio loop works, just slower
     asyncio.run(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Run the Playwright test scripts concurrently on one driver process.
+
+test_interop and test_mobile share a single Chromium (separate contexts);
+test_pwa_linux needs its own persistent --app window.
+"""
+import asyncio, sys
+from playwright.async_api import async_playwright
+from bench_setup import make_chromium
+from test_interop import test_interop
+from test_mobile import test_mobile
+from test_pwa_linux import test_linux_pwa
+
+async def run_all():
+    async with async_playwright() as pw:
+        browser = await make_chromium(pw)
+        try:
+            results = await asyncio.gather(
+                test_interop(browser),
+                test_mobile(browser),
+                test_linux_pwa(pw),
+                return_exceptions=True,
+            )
+        finally:
+            await browser.close()
+
+    failed = 0
+    for name, result in zip(('interop', 'mobile', 'pwa_linux'), results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f'[✗] {name}: {result!r}')
+        else:
+            print(f'[✓] {name}')
+    return failed == 0
+
+if __name__ == '__main__':
+    sys.exit(0 if asyncio.run(run_all()) else 1)
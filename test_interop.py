@@ -8,120 +8,187 @@ This test:
 4. Verifies bidirectional message exchange
 """
 import asyncio
+import re
 import sys
-from playwright.async_api import async_playwright
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright, expect
 from ghost_client import GhostClient
+from bench_setup import make_chromium, RESET_ROOM_STATE_JS
 
 URL = 'http://localhost:8091/ghost.html'
-
-async def test_interop():
+PROFILE_DIR = '/tmp/ghost-interop-profile'  # reused across standalone runs
+
+# Resolves as soon as the predicate holds: re-checked on every DOM mutation
+# and input event instead of on Playwright's polling interval.
+WAIT_DOM_JS = """([pred, timeout]) => new Promise((res, rej) => {
+    const test = new Function('return (' + pred + ')');
+    const done = () => { clearTimeout(t); obs.disconnect(); document.removeEventListener('input', check, true); };
+    const check = () => { try { if (test()) { done(); res(); } } catch (e) {} };
+    const t = setTimeout(() => { done(); rej(new Error('wait_dom timeout: ' + pred)); }, timeout);
+    const obs = new MutationObserver(check);
+    obs.observe(document.body, {subtree: true, childList: true, characterData: true,
+                                attributes: true, attributeFilter: ['value']});
+    document.addEventListener('input', check, true);
+    check();
+})"""
+
+# Calls window.notifyPy(count) once `target` messages containing `text` are shown
+NOTIFY_COUNT_JS = """([text, target]) => {
+    const box = document.getElementById('messages');
+    const check = () => {
+        const n = [...box.querySelectorAll('.msg')].filter(m => m.textContent.includes(text)).length;
+        if (n >= target) { obs.disconnect(); window.notifyPy(n); }
+    };
+    const obs = new MutationObserver(check);
+    obs.observe(box, {subtree: true, childList: true, characterData: true});
+    check();
+}"""
+
+async def wait_dom(page, predicate, timeout=10000):
+    """Wait until a JS expression is truthy in the page, push-driven."""
+    await page.evaluate(WAIT_DOM_JS, [predicate, timeout])
+
+async def receive_until(client, predicate, timeout=10.0):
+    """Return the first message matching predicate, discarding the rest,
+    all within one timeout budget."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        msg = await client.receive(timeout=max(deadline - loop.time(), 0.001))
+        if predicate(msg):
+            return msg
+        print(f'[+] Drained {msg.type} message: {msg.text}')
+
+async def test_interop(browser):
+    """Browser (offerer) <-> Python (answerer), in a fresh context on browser."""
+    ctx = await browser.new_context(viewport={'width': 880, 'height': 680})
+    try:
+        await run_interop(ctx)
+    finally:
+        await ctx.close()
+
+async def stress_interop(browser, rounds):
+    """Run the interop flow repeatedly. Rounds after the first start from the
+    first round's storage snapshot, skipping the app's first-visit setup."""
+    state = None
+    for i in range(rounds):
+        print(f'[*] Round {i + 1}/{rounds}')
+        ctx = await browser.new_context(viewport={'width': 880, 'height': 680},
+                                        storage_state=state)
+        try:
+            snapshot = await run_interop(ctx, snapshot=state is None)
+        finally:
+            await ctx.close()
+        state = state or snapshot
+
+async def run_interop(ctx, snapshot=False):
+    """Returns ctx.storage_state() taken once the app is up, if snapshot is set."""
     print('[*] Starting interop test: Browser (offerer) <-> Python (answerer)')
 
-    # Start browser
+    page = ctx.pages[0] if ctx.pages else await ctx.new_page()
+
+    # Browser creates room
+    print('[*] Browser creating room...')
+    await page.goto(URL)
+    await page.wait_for_selector('#nick-in')
+    state = await ctx.storage_state() if snapshot else None
+    await page.fill('#nick-in', 'browser-alice')
+    await page.click('#btn-create')
+
+    # Wait for offer code
+    await expect(page.locator('#my-code')).to_have_value(re.compile(r'^O:'), timeout=15000)
+    # Offer code and room URL in one round-trip, read from the same page state
+    data = await page.evaluate(
+        "() => ({code: document.querySelector('#my-code').value, url: location.href})")
+    offer_code = data['code']
+    print(f'[+] Browser offer code: {offer_code[:50]}...')
+
+    # Extract room credentials from URL
+    room_id, room_key_b64 = urlparse(data['url']).fragment.split('.')
+    print(f'[+] Room ID: {room_id}')
+
+    # Python client joins
+    print('[*] Python client joining...')
+    client = GhostClient(nick='python-bob')
+    await client.set_room(room_id, room_key_b64)
+    answer_code = await client.accept_offer(offer_code)
+    print(f'[+] Python answer code: {answer_code[:50]}...')
+
+    # Browser accepts answer
+    await page.fill('#peer-code', answer_code)
+    await page.click('#btn-connect')
+
+    # Wait for both sides to connect
+    print('[*] Waiting for connection...')
+    await page.wait_for_selector('#chat-view', timeout=15000)
+    await client.wait_connected(timeout=15.0)
+    print('[+] Connected!')
+
+    # Test: Browser sends, Python receives
+    print('[*] Test 1: Browser -> Python')
+    await page.fill('#msg-in', 'Hello from browser!')
+    await page.click('#btn-send')
+
+    # Skip any join notices
+    msg = await receive_until(client, lambda m: m.type == 'chat', timeout=10.0)
+    print(f'[+] Python received: {msg.nick}: {msg.text}')
+    assert msg.text == 'Hello from browser!', f"Expected 'Hello from browser!', got '{msg.text}'"
+
+    # Test: Python sends, Browser receives
+    print('[*] Test 2: Python -> Browser')
+    await client.send('Hello from Python!')
+
+    # Wait for message to appear in browser
+    await wait_dom(page,
+        "[...document.querySelectorAll('#messages .msg')]"
+        ".some(m => m.textContent.includes('Hello from Python!'))",
+        timeout=10000
+    )
+    print('[+] Browser received Python message')
+
+    # Test: Multiple messages
+    print('[*] Test 3: Multiple messages')
+    # The page reports back once all three are shown, so nothing polls
+    arrived = asyncio.get_running_loop().create_future()
+    await page.expose_function('notifyPy', lambda n: arrived.done() or arrived.set_result(n))
+    await page.evaluate(NOTIFY_COUNT_JS, ['Python message', 3])
+    # No pacing needed: the data channel is ordered
+    for i in range(3):
+        await client.send(f'Python message {i}')
+
+    await asyncio.wait_for(arrived, 10)
+    print('[+] All messages received')
+
+    print('\n[✓] All interop tests passed!')
+
+    # Cleanup
+    await client.close()
+    return state
+
+async def main(rounds=1):
     async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=False, args=[
-            '--disable-gpu', '--window-size=900,700'
-        ])
-        ctx = await browser.new_context(viewport={'width': 880, 'height': 680})
-        page = await ctx.new_page()
-
-        # Browser creates room
-        print('[*] Browser creating room...')
-        await page.goto(URL)
-        await page.wait_for_selector('#nick-in')
-        await page.fill('#nick-in', 'browser-alice')
-        await page.click('#btn-create')
-
-        # Wait for offer code
-        await page.wait_for_function(
-            "document.querySelector('#my-code')?.value?.startsWith('O:')",
-            timeout=15000
-        )
-        offer_code = await page.input_value('#my-code')
-        room_url = page.url
-        print(f'[+] Browser offer code: {offer_code[:50]}...')
-
-        # Extract room credentials from URL
-        hash_part = room_url.split('#')[1]
-        room_id, room_key_b64 = hash_part.split('.')
-        print(f'[+] Room ID: {room_id}')
-
-        # Python client joins
-        print('[*] Python client joining...')
-        client = GhostClient(nick='python-bob')
-        await client.set_room(room_id, room_key_b64)
-        answer_code = await client.accept_offer(offer_code)
-        print(f'[+] Python answer code: {answer_code[:50]}...')
-
-        # Browser accepts answer
-        await page.fill('#peer-code', answer_code)
-        await page.click('#btn-connect')
-
-        # Wait for both sides to connect
-        print('[*] Waiting for connection...')
-        await page.wait_for_selector('#chat-view', timeout=15000)
-        await client.wait_connected(timeout=15.0)
-        print('[+] Connected!')
-
-        # Test: Browser sends, Python receives
-        print('[*] Test 1: Browser -> Python')
-        await page.fill('#msg-in', 'Hello from browser!')
-        await page.click('#btn-send')
-
-        # May need to drain the join message first
-        msg = await client.receive(timeout=10.0)
-        if msg.type == 'sys' and 'joined' in msg.text:
-            print(f'[+] Drained join message: {msg.text}')
-            msg = await client.receive(timeout=10.0)
-        print(f'[+] Python received: {msg.nick}: {msg.text}')
-        assert msg.text == 'Hello from browser!', f"Expected 'Hello from browser!', got '{msg.text}'"
-
-        # Test: Python sends, Browser receives
-        print('[*] Test 2: Python -> Browser')
-        await client.send('Hello from Python!')
-
-        # Wait for message to appear in browser
-        await page.wait_for_function(
-            """() => {
-                const msgs = document.querySelectorAll('#messages .msg');
-                for (const m of msgs) {
-                    if (m.textContent.includes('Hello from Python!')) return true;
-                }
-                return false;
-            }""",
-            timeout=10000
-        )
-        print('[+] Browser received Python message')
-
-        # Test: Multiple messages
-        print('[*] Test 3: Multiple messages')
-        for i in range(3):
-            await client.send(f'Python message {i}')
-            await asyncio.sleep(0.3)
-
-        await page.wait_for_function(
-            """() => {
-                const msgs = document.querySelectorAll('#messages .msg');
-                let count = 0;
-                for (const m of msgs) {
-                    if (m.textContent.includes('Python message')) count++;
-                }
-                return count >= 3;
-            }""",
-            timeout=10000
-        )
-        print('[+] All messages received')
-
-        print('\n[✓] All interop tests passed!')
-
-        # Cleanup
-        await client.close()
-        await browser.close()
-        return True
+        if rounds > 1:
+            browser = await make_chromium(pw)
+            try:
+                await stress_interop(browser, rounds)
+            finally:
+                await browser.close()
+            return True
+        # sw.js serves ghost.html cache-first; block it so a reused profile
+        # always tests the file the dev server is serving
+        ctx = await make_chromium(pw, viewport={'width': 880, 'height': 680},
+                                  persistent_dir=PROFILE_DIR, service_workers='block')
+        await ctx.add_init_script(RESET_ROOM_STATE_JS)
+        try:
+            await run_interop(ctx)
+        finally:
+            await ctx.close()
+    return True
 
 if __name__ == '__main__':
     try:
-        success = asyncio.run(test_interop())
+        rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+        success = asyncio.run(main(rounds))
         sys.exit(0 if success else 1)
     except Exception as e:
         print(f'\n[✗] Test failed: {e}')
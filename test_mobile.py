@@ -1,132 +1,140 @@
 #!/usr/bin/env python3
 """Test Ghost Chat mobile PWA experience using Playwright mobile emulation."""
 import asyncio
-from playwright.async_api import async_playwright
+import re
+from playwright.async_api import async_playwright, expect
+from bench_setup import make_chromium, block_heavy_resources, RESET_ROOM_STATE_JS, wait_for_ctrl_c
 
 # URL = 'https://karans4.github.io/ghostchat/'
 URL = 'http://localhost:8091/index.html'
+PROFILE_DIR = '/tmp/ghost-mobile-profile'  # reused across standalone runs
 
 # iPhone 14 Pro dimensions and user agent
 MOBILE_VIEWPORT = {'width': 393, 'height': 852}
 MOBILE_USER_AGENT = 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1'
-
-async def test_mobile():
+MOBILE_CONTEXT = dict(
+    viewport=MOBILE_VIEWPORT,
+    user_agent=MOBILE_USER_AGENT,
+    device_scale_factor=3,  # Retina display
+    is_mobile=True,
+    has_touch=True,
+)
+
+async def test_mobile(browser):
+    """Mobile checks in a fresh mobile context on browser."""
+    ctx = await browser.new_context(**MOBILE_CONTEXT)
+    try:
+        await run_mobile(ctx)
+    finally:
+        await ctx.close()
+
+async def run_mobile(ctx, keep_open=False):
+    """keep_open=True leaves the page up for manual testing until Ctrl+C."""
     print('[*] Testing Ghost Chat mobile PWA experience')
     print(f'[*] URL: {URL}')
     print(f'[*] Viewport: {MOBILE_VIEWPORT}')
 
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=False, args=[
-            '--disable-gpu',
-            f'--window-size={MOBILE_VIEWPORT["width"]},{MOBILE_VIEWPORT["height"]}',
-        ])
-
-        # Create mobile context
-        ctx = await browser.new_context(
-            viewport=MOBILE_VIEWPORT,
-            user_agent=MOBILE_USER_AGENT,
-            device_scale_factor=3,  # Retina display
-            is_mobile=True,
-            has_touch=True,
-        )
-
-        page = await ctx.new_page()
-
-        # Enable PWA display mode detection
-        await page.goto(URL)
-        print('[*] Page loaded')
-
-        # Wait for load
-        await page.wait_for_load_state('networkidle')
-        await asyncio.sleep(2)
-
-        # Check manifest
-        manifest = await page.evaluate("""() => {
+    page = ctx.pages[0] if ctx.pages else await ctx.new_page()
+    await page.route('**/*', block_heavy_resources)
+
+    # Enable PWA display mode detection
+    await page.goto(URL, wait_until='domcontentloaded')
+    await page.wait_for_selector('#nick-in')
+    print('[*] Page loaded')
+
+    # Screenshot home screen
+    await page.screenshot(path='/mnt/shared/ghost_mobile_home.png', full_page=False)
+    print('[*] Screenshot saved: /mnt/shared/ghost_mobile_home.png')
+
+    # Test creating a room
+    print('[*] Testing room creation...')
+    await page.fill('#nick-in', 'mobile-test')
+    await page.click('#btn-create')
+
+    await expect(page.locator('#my-code')).to_have_value(re.compile(r'^O:'), timeout=15000)
+    offer = await page.input_value('#my-code')
+    print(f'[+] Room created, offer code: {offer[:40]}...')
+
+    # Screenshot room creation; the checks below only read the page, so
+    # capture overlaps them
+    screenshot_task = asyncio.create_task(
+        page.screenshot(path='/mnt/shared/ghost_mobile_room.png', full_page=False))
+
+    # Page checks in one round-trip: manifest, service worker, standalone,
+    # QR presence, layout overflow, touch targets (minimum 44x44px for accessibility).
+    # The static lookups (manifest link, QR) stay here too: splitting them out
+    # into a page.content() snapshot would add a round-trip, not remove one.
+    try:
+        results = await page.evaluate("""async () => {
             const link = document.querySelector('link[rel="manifest"]');
-            if (!link) return null;
-            return fetch(link.href).then(r => r.json()).catch(() => null);
-        }""")
-        print(f'[+] Manifest: {manifest["name"] if manifest else "NOT FOUND"}')
-        if manifest:
-            print(f'    display: {manifest.get("display", "not set")}')
-            print(f'    start_url: {manifest.get("start_url", "not set")}')
-            print(f'    theme_color: {manifest.get("theme_color", "not set")}')
-
-        # Check service worker
-        sw = await page.evaluate("""() => {
-            return navigator.serviceWorker ? 'supported' : 'not supported';
-        }""")
-        print(f'[+] Service Worker: {sw}')
-
-        # Check standalone mode capability
-        standalone = await page.evaluate("""() => {
-            return window.matchMedia('(display-mode: standalone)').matches;
-        }""")
-        print(f'[+] Standalone mode: {standalone}')
-
-        # Screenshot home screen
-        await page.screenshot(path='/mnt/shared/ghost_mobile_home.png', full_page=False)
-        print('[*] Screenshot saved: /mnt/shared/ghost_mobile_home.png')
-
-        # Test creating a room
-        print('[*] Testing room creation...')
-        await page.wait_for_selector('#nick-in')
-        await page.fill('#nick-in', 'mobile-test')
-        await page.click('#btn-create')
-
-        await page.wait_for_function(
-            "document.querySelector('#my-code')?.value?.startsWith('O:')",
-            timeout=15000
-        )
-        offer = await page.input_value('#my-code')
-        print(f'[+] Room created, offer code: {offer[:40]}...')
-
-        # Screenshot room creation
-        await page.screenshot(path='/mnt/shared/ghost_mobile_room.png', full_page=False)
-        print('[*] Screenshot saved: /mnt/shared/ghost_mobile_room.png')
-
-        # Check QR code visibility
-        qr = await page.query_selector('#offer-qr svg, #offer-qr img')
-        print(f'[+] QR code visible: {qr is not None}')
-
-        # Check layout doesn't overflow
-        overflow = await page.evaluate("""() => {
+            const manifest = link ? await fetch(link.href).then(r => r.json()).catch(() => null) : null;
+            const sw = navigator.serviceWorker ? 'supported' : 'not supported';
+            const standalone = window.matchMedia('(display-mode: standalone)').matches;
+            const qr = !!document.querySelector('#offer-qr svg, #offer-qr img');
             const body = document.body;
-            return body.scrollWidth > body.clientWidth || body.scrollHeight > body.clientHeight;
-        }""")
-        print(f'[+] Layout overflow: {overflow}')
-
-        # Test touch targets (minimum 44x44px for accessibility)
-        touch_targets = await page.evaluate("""() => {
-            const buttons = document.querySelectorAll('button');
+            const overflow = body.scrollWidth > body.clientWidth || body.scrollHeight > body.clientHeight;
             const small = [];
-            buttons.forEach(b => {
+            document.querySelectorAll('button').forEach(b => {
                 const rect = b.getBoundingClientRect();
                 if (rect.width < 44 || rect.height < 44) {
                     small.push({text: b.textContent.slice(0,20), w: rect.width, h: rect.height});
                 }
             });
-            return small;
+            return {manifest, sw, standalone, qr, overflow, small};
         }""")
-        if touch_targets:
-            print(f'[!] Small touch targets: {len(touch_targets)}')
-            for t in touch_targets[:3]:
-                print(f'    {t}')
-        else:
-            print('[+] All touch targets adequate (>=44px)')
-
-        print('\n[✓] Mobile test complete')
-        print('[*] Browser will stay open for manual testing')
-        print('[*] Press Ctrl+C to close')
-
-        # Keep browser open
+    except BaseException:
+        # Don't leave the capture running unobserved while the context closes
+        screenshot_task.cancel()
+        await asyncio.gather(screenshot_task, return_exceptions=True)
+        raise
+    manifest = results['manifest']
+    print(f'[+] Manifest: {manifest["name"] if manifest else "NOT FOUND"}')
+    if manifest:
+        print(f'    display: {manifest.get("display", "not set")}')
+        print(f'    start_url: {manifest.get("start_url", "not set")}')
+        print(f'    theme_color: {manifest.get("theme_color", "not set")}')
+    print(f'[+] Service Worker: {results["sw"]}')
+    print(f'[+] Standalone mode: {results["standalone"]}')
+    print(f'[+] QR code visible: {results["qr"]}')
+    print(f'[+] Layout overflow: {results["overflow"]}')
+
+    touch_targets = results['small']
+    if touch_targets:
+        print(f'[!] Small touch targets: {len(touch_targets)}')
+        for t in touch_targets[:3]:
+            print(f'    {t}')
+    else:
+        print('[+] All touch targets adequate (>=44px)')
+
+    await screenshot_task
+    print('[*] Screenshot saved: /mnt/shared/ghost_mobile_room.png')
+
+    print('\n[✓] Mobile test complete')
+
+    if not keep_open:
+        return
+
+    print('[*] Browser will stay open for manual testing')
+    print('[*] Press Ctrl+C to close')
+
+    # Keep browser open
+    try:
+        await wait_for_ctrl_c()
+    except KeyboardInterrupt:
+        pass
+
+async def main():
+    async with async_playwright() as pw:
+        ctx = await make_chromium(
+            # sw.js is cache-first (manifest.json included); block it so a
+            # reused profile never serves stale assets
+            pw, headless=False, persistent_dir=PROFILE_DIR, service_workers='block', **MOBILE_CONTEXT,
+            extra_args=[f'--window-size={MOBILE_VIEWPORT["width"]},{MOBILE_VIEWPORT["height"]}'])
+        await ctx.add_init_script(RESET_ROOM_STATE_JS)
         try:
-            while True:
-                await asyncio.sleep(1)
-        except KeyboardInterrupt:
-            pass
+            await run_mobile(ctx, keep_open=True)
         finally:
-            await browser.close()
+            await ctx.close()
 
 if __name__ == '__main__':
-    asyncio.run(test_mobile())
+    asyncio.run(main())
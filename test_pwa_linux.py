@@ -2,30 +2,32 @@
 """Test Ghost Chat PWA on Linux desktop + phone interop."""
 import asyncio
 from playwright.async_api import async_playwright
+from bench_setup import make_chromium, block_heavy_resources, wait_for_ctrl_c
 
 URL = 'https://notruefireman.org/ghost/'
 
-async def test_linux_pwa():
+async def test_linux_pwa(pw, keep_open=False):
+    """Run the PWA test in its own --app window.
+    keep_open=True leaves it up for phone testing until Ctrl+C."""
     print('[*] Testing Ghost Chat PWA on Linux')
     print(f'[*] URL: {URL}')
 
-    async with async_playwright() as pw:
-        # Launch with PWA-like window
-        browser = await pw.chromium.launch_persistent_context(
-            '/tmp/ghost-pwa-test',
-            headless=False,
-            args=[
-                '--app=' + URL,  # PWA mode
-                '--window-size=900,700',
-                '--window-position=100,100',
-            ]
-        )
+    # Launch with PWA-like window
+    browser = await make_chromium(
+        pw, headless=False, persistent_dir='/tmp/ghost-pwa-test',
+        extra_args=[
+            '--app=' + URL,  # PWA mode
+            '--window-size=900,700',
+            '--window-position=100,100',
+        ]
+    )
 
+    try:
         page = await browser.new_page()
-        await page.goto(URL)
-
+        await page.route('**/*', block_heavy_resources)
+        await page.goto(URL, wait_until='domcontentloaded')
+        await page.wait_for_selector('#nick-in')
         print('[*] Page loaded')
-        await page.wait_for_load_state('networkidle')
 
         # Check PWA installability
         manifest = await page.evaluate("""() => {
@@ -34,7 +36,6 @@ async def test_linux_pwa():
         print(f'[+] Related apps API: {manifest}')
 
         # Create room
-        await page.wait_for_selector('#nick-in')
         await page.fill('#nick-in', 'linux-desktop')
         await page.click('#btn-create')
         print('[*] Creating room...')
@@ -48,15 +49,19 @@ async def test_linux_pwa():
         print('[*] Screenshot saved: /mnt/shared/ghost_pwa_qr.png')
         print('[*] Scan this QR with your phone to test!')
 
-        # Keep open
-        print('[*] Press Ctrl+C to close')
-        try:
-            while True:
-                await asyncio.sleep(1)
-        except KeyboardInterrupt:
-            pass
-        finally:
-            await browser.close()
+        if keep_open:
+            print('[*] Press Ctrl+C to close')
+            try:
+                await wait_for_ctrl_c()
+            except KeyboardInterrupt:
+                pass
+    finally:
+        # Always close: a headed persistent context left open keeps its profile locked
+        await browser.close()
+
+async def main():
+    async with async_playwright() as pw:
+        await test_linux_pwa(pw, keep_open=True)
 
 if __name__ == '__main__':
-    asyncio.run(test_linux_pwa())
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Round-trip every message type through GhostClient's wire format.
+
+No browser or WebRTC needed: the data channel is a stub that records the
+frames _send_raw produces, which are then fed to the peer's _handle_raw.
+Covers both the binary (msgpack + type tag) and the text (base64 + JSON)
+frames. The binary half needs msgpack installed.
+"""
+import asyncio
+import sys
+import ghost_client
+from ghost_client import GhostClient, WIRE_MAGIC
+
+class StubChannel:
+    readyState = 'open'
+
+    def __init__(self):
+        self.frames = []
+
+    def send(self, data):
+        self.frames.append(data)
+
+async def roundtrip(binary):
+    alice, bob = GhostClient(nick='alice'), GhostClient(nick='bob')
+    room_id, key_b64 = 'r00m', ghost_client.b64url_encode(ghost_client.generate_room_key())
+    await alice.set_room(room_id, key_b64)
+    await bob.set_room(room_id, key_b64)
+    alice.dc = StubChannel()
+    alice._binary = binary
+
+    chat = {'id': 'c1', 'type': 'chat', 'from': alice.my_id, 'nick': 'alice', 'text': 'hello', 'ts': 1.0}
+    replayed = {'id': 'c2', 'type': 'chat', 'from': alice.my_id, 'nick': 'alice', 'text': 'earlier', 'ts': 0.5}
+    for msg in (
+        {'type': 'join', 'peerId': alice.my_id, 'nick': 'alice', 'bin': 1},
+        chat,
+        {'type': 'sync', 'messages': [replayed, chat]},  # chat c1 is a repeat
+        {'type': 'destroy'},
+    ):
+        await alice._send_raw(msg)
+
+    for frame in alice.dc.frames:
+        if binary:
+            assert isinstance(frame, bytes) and frame[:2] == WIRE_MAGIC, frame
+        else:
+            assert isinstance(frame, str), frame
+        await bob._handle_raw(frame)
+
+    got = []
+    while bob.has_messages():
+        got.append(await bob.receive())
+    assert [(m.type, m.text) for m in got] == [
+        ('sys', 'alice joined'),
+        ('chat', 'hello'),
+        ('chat', 'earlier'),
+        ('sys', 'Room destroyed by admin'),
+    ], got
+    assert got[1].id == 'c1' and got[1].from_id == alice.my_id and got[1].nick == 'alice'
+    # The join advertised binary support
+    assert bob._binary == (ghost_client.msgpack is not None)
+
+async def test_text_roundtrip():
+    await roundtrip(binary=False)
+
+async def test_binary_roundtrip():
+    assert ghost_client.msgpack is not None, 'binary frames need msgpack'
+    await roundtrip(binary=True)
+
+async def main():
+    await test_text_roundtrip()
+    print('[✓] text frames')
+    await test_binary_roundtrip()
+    print('[✓] binary frames')
+    return True
+
+if __name__ == '__main__':
+    try:
+        sys.exit(0 if asyncio.run(main()) else 1)
+    except Exception as e:
+        print(f'\n[✗] Test failed: {e!r}')
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)